@@ -4,6 +4,8 @@ import random
 import re
 import os
 import logging
+import atexit
+from functools import lru_cache
 from datetime import datetime
 
 # Настройка логирования
@@ -12,6 +14,20 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# 📼 Запись трафика для воспроизведения (включается переменной TRAFFIC_CAPTURE_DIR)
+capture_dir = os.environ.get("TRAFFIC_CAPTURE_DIR")
+if capture_dir:
+    from traffic_capture import CaptureWriter, TrafficCaptureMiddleware
+
+    capture_writer = CaptureWriter(capture_dir)
+    atexit.register(capture_writer.close)
+    app.wsgi_app = TrafficCaptureMiddleware(
+        app.wsgi_app,
+        capture_writer,
+        sample_rate=float(os.environ.get("TRAFFIC_CAPTURE_RATE", "0.1"))
+    )
+    logger.info(f"Запись трафика включена: {capture_dir}")
+
 # 📂 Путь к Excel-файлу
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 excel_path = os.path.join(BASE_DIR, "questions.xlsx")
@@ -56,10 +72,12 @@ def get_alice_image_id(image_name):
 
 
 quizzes = {}
+# Индекс вопросов по ID вида "<тема>:<номер строки в Excel>" для пакетной проверки
+questions_by_id = {}
 for sheet_name in sheet_names:
     sheet = workbook[sheet_name]
     data = []
-    for row in sheet.iter_rows(min_row=2, values_only=True):
+    for row_number, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), 2):
         if all(cell is None for cell in row):
             continue
         question, options, correct, explanation, image = (row + (None, None, None, None, None))[:5]
@@ -75,6 +93,7 @@ for sheet_name in sheet_names:
             "Пояснение": str(explanation).strip() if explanation else "",
             "Изображение": alice_image_id
         })
+        questions_by_id[f"{sheet_name}:{row_number}"] = (sheet_name, data[-1])
     quizzes[sheet_name] = data
 
 
@@ -136,6 +155,112 @@ def parse_multiple_answers(command):
     return normalized_answers
 
 
+def grade_answers(user_answers, correct_answers_normalized):
+    """Оценить ответ: (вердикт, верные, неверные, пропущенные)"""
+    correct_given = [ans for ans in user_answers if ans in correct_answers_normalized]
+    incorrect_given = [ans for ans in user_answers if ans not in correct_answers_normalized]
+    missing = [ans for ans in correct_answers_normalized if ans not in user_answers]
+
+    if not user_answers:
+        verdict = "unrecognized"
+    elif not incorrect_given and len(correct_given) == len(correct_answers_normalized):
+        verdict = "correct"
+    elif len(correct_given) > 0:
+        verdict = "partial"
+    else:
+        verdict = "incorrect"
+
+    return verdict, correct_given, incorrect_given, missing
+
+
+# ===============================
+# 📝 Пакетная проверка ответов
+# ===============================
+MAX_BATCH_SIZE = 10000
+MAX_ANSWER_LENGTH = 200
+
+
+@lru_cache(maxsize=4096)
+def parse_answer_cached(answer):
+    """Разбор строки ответа с кэшем: в пакетах одни и те же ответы повторяются"""
+    return tuple(parse_multiple_answers(answer.strip().lower()))
+
+
+def answer_to_text(answer):
+    """Привести ответ к строке; ValueError для списков, словарей и слишком длинных строк"""
+    if answer is None:
+        return ""
+    if isinstance(answer, bool) or not isinstance(answer, (str, int, float)):
+        raise ValueError(f"Ответ должен быть строкой, числом или null: {answer!r}")
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    answer = str(answer)
+    if len(answer) > MAX_ANSWER_LENGTH:
+        raise ValueError(f"Ответ длиннее {MAX_ANSWER_LENGTH} символов")
+    return answer
+
+
+def format_letters(answers):
+    return [f"{ans.upper()})" for ans in answers]
+
+
+def grade_batch(items):
+    """Проверить пары (ID вопроса, ответ) за один проход.
+
+    Возвращает вердикты по каждому ответу и сводку по темам.
+    Некорректный ответ (не строка/число/None или длиннее MAX_ANSWER_LENGTH) — ValueError.
+    """
+    correct_by_id = {}
+    graded = {}
+    results = []
+    topics = {}
+    unknown = 0
+
+    for question_id, answer in items:
+        question_id = str(question_id)
+        answer = answer_to_text(answer)
+
+        key = (question_id, answer)
+        if key not in graded:
+            if question_id not in questions_by_id:
+                graded[key] = (None, {"question_id": question_id, "verdict": "unknown_question"})
+            else:
+                topic, question = questions_by_id[question_id]
+                if question_id not in correct_by_id:
+                    correct_by_id[question_id] = normalize_correct_answers(question["Правильный"])
+                verdict, correct_given, incorrect_given, missing = grade_answers(
+                    parse_answer_cached(answer), correct_by_id[question_id])
+                graded[key] = (topic, {
+                    "question_id": question_id,
+                    "verdict": verdict,
+                    "correct": format_letters(correct_given),
+                    "incorrect": format_letters(incorrect_given),
+                    "missing": format_letters(missing)
+                })
+
+        topic, result = graded[key]
+        results.append(dict(result))
+
+        if topic is None:
+            unknown += 1
+            continue
+        stats = topics.setdefault(topic, {
+            "total": 0, "correct": 0, "partial": 0, "incorrect": 0, "unrecognized": 0
+        })
+        stats["total"] += 1
+        stats[result["verdict"]] += 1
+
+    for stats in topics.values():
+        stats["percent"] = round(100 * stats["correct"] / stats["total"], 1)
+
+    return {
+        "results": results,
+        "topics": topics,
+        "total": len(results),
+        "unknown_questions": unknown
+    }
+
+
 # Временное хранилище сессий
 user_sessions = {}
 
@@ -331,16 +456,14 @@ def main():
                 user_sessions[session_id] = user_state
                 return jsonify(response)
 
-            correct_given = [ans for ans in user_answers if ans in correct_answers_normalized]
-            incorrect_given = [ans for ans in user_answers if ans not in correct_answers_normalized]
+            verdict, correct_given, incorrect_given, missing = grade_answers(user_answers, correct_answers_normalized)
 
-            if not incorrect_given and len(correct_given) == len(correct_answers_normalized):
+            if verdict == "correct":
                 text = "Верно!"
-            elif not incorrect_given and len(correct_given) > 0:
-                missing = [ans for ans in correct_answers_normalized if ans not in user_answers]
+            elif verdict == "partial" and not incorrect_given:
                 missing_text = ", ".join([f"{ans.upper()})" for ans in missing])
                 text = f"Частично верно! Вы выбрали правильные ответы, но не хватает: {missing_text}\n\n{current_question['Пояснение']}"
-            elif len(correct_given) > 0 and len(incorrect_given) > 0:
+            elif verdict == "partial":
                 correct_text = ", ".join([f"{ans.upper()})" for ans in correct_given])
                 incorrect_text = ", ".join([f"{ans.upper()})" for ans in incorrect_given])
                 text = f"Частично верно! Правильные: {correct_text}, неправильные: {incorrect_text}\n\n{current_question['Пояснение']}"
@@ -410,6 +533,54 @@ def jsonify_error(message):
     })
 
 
+@app.route("/questions", methods=["GET"])
+def list_questions():
+    """Список вопросов с ID для пакетной проверки.
+
+    ID имеет вид "<тема>:<номер строки в Excel>", например "1 документ:2"
+    для первого вопроса на листе (строка 1 — заголовок).
+    """
+    return jsonify({
+        "status": "success",
+        "questions": [
+            {"id": question_id, "topic": topic, "question": question["Вопрос"], "options": question["Варианты"]}
+            for question_id, (topic, question) in questions_by_id.items()
+        ]
+    })
+
+
+@app.route("/grade/batch", methods=["POST"])
+def grade_batch_endpoint():
+    """Пакетная проверка: {"answers": [{"question_id": "1 документ:2", "answer": "а б"}, ...]}.
+
+    Вместо объектов можно передавать пары ["1 документ:2", "а б"].
+    ID вопросов — "<тема>:<номер строки в Excel>", их список отдаёт GET /questions.
+    """
+    req = request.get_json(silent=True)
+    answers = req.get("answers") if isinstance(req, dict) else None
+    if not isinstance(answers, list):
+        return jsonify({"status": "error", "message": "Ожидается поле 'answers' со списком ответов"}), 400
+    if len(answers) > MAX_BATCH_SIZE:
+        return jsonify({"status": "error", "message": f"Не больше {MAX_BATCH_SIZE} ответов за запрос"}), 400
+
+    items = []
+    for item in answers:
+        if isinstance(item, dict) and "question_id" in item:
+            items.append((item["question_id"], item.get("answer")))
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            items.append((item[0], item[1]))
+        else:
+            return jsonify({"status": "error", "message": f"Некорректный элемент: {item!r}"}), 400
+        try:
+            answer_to_text(items[-1][1])
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    result = grade_batch(items)
+    logger.info(f"Пакетная проверка: {result['total']} ответов, тем: {len(result['topics'])}")
+    return jsonify({"status": "success", **result})
+
+
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({
@@ -0,0 +1,2 @@
+# test_alice.py — ручной скрипт для запущенного сервера, pytest его не собирает
+collect_ignore = ["test_alice.py"]
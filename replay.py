@@ -0,0 +1,181 @@
+"""Воспроизведение записанного трафика против одной или двух версий навыка.
+
+Регрессионная проверка — режим --compare: обе версии получают одинаковый seed для random,
+поэтому выбор вопросов совпадает и ответы сравниваются целиком.
+
+Без --compare прогон сравнивается с записанными ответами только по структуре (кнопки,
+end_session): в продакшене вопросы выбирались случайно, и тексты воспроизвести нельзя.
+Этот режим годится для замера задержки и проверки, что диалог идёт по тем же веткам.
+
+Примеры:
+    python replay.py captures/*.jsonl.gz --app app.py:app
+    python replay.py captures/*.jsonl.gz --app old/app.py:app --compare app.py:app --rate 50
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+
+from werkzeug.test import Client
+
+from traffic_capture import read_captures
+
+
+def load_wsgi_app(spec, index):
+    """Загрузить WSGI-приложение по строке вида 'путь/к/файлу.py:переменная'"""
+    path, _, attr = spec.partition(":")
+    path = os.path.abspath(path)
+    module_name = f"replay_target_{index}"
+
+    # Не пишем трафик повторно во время воспроизведения
+    os.environ.pop("TRAFFIC_CAPTURE_DIR", None)
+
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        module_spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    finally:
+        sys.path.pop(0)
+    return getattr(module, attr or "app")
+
+
+def replay(wsgi_app, records, rate=0.0, seed=None):
+    """Прогнать записи через приложение с заданной частотой (запросов в секунду, 0 — без ограничения)"""
+    if seed is not None:
+        random.seed(seed)
+
+    client = Client(wsgi_app)
+    results = []
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_at = time.perf_counter()
+
+    for record in records:
+        if interval:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_at += interval
+
+        started = time.perf_counter()
+        response = client.open(
+            record["path"],
+            method=record["method"],
+            query_string=record.get("query", ""),
+            data=record["request"].encode("utf-8"),
+            content_type=record.get("content_type") or "application/json"
+        )
+        body = response.get_data(as_text=True)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        results.append({"status": response.status, "response": body, "duration_ms": duration_ms})
+    return results
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(results):
+    values = sorted(r["duration_ms"] for r in results)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else 0.0
+    }
+
+
+def normalize_body(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body
+
+
+def response_shape(body):
+    """Части ответа навыка, не зависящие от случайного выбора вопроса"""
+    data = normalize_body(body)
+    if not isinstance(data, dict) or not isinstance(data.get("response"), dict):
+        return data
+    return {
+        "buttons": [button.get("title") for button in data["response"].get("buttons", [])],
+        "end_session": data["response"].get("end_session")
+    }
+
+
+def preview(body, limit=200):
+    return json.dumps(normalize_body(body), ensure_ascii=False)[:limit]
+
+
+def compare(records, baseline, candidate, max_diffs=10, key=normalize_body):
+    """Сравнить ответы двух прогонов по key(тело ответа), вернуть число расхождений"""
+    mismatches = 0
+    for record, a, b in zip(records, baseline, candidate):
+        if a["status"] == b["status"] and key(a["response"]) == key(b["response"]):
+            continue
+        mismatches += 1
+        if mismatches <= max_diffs:
+            print(f"\n❌ Расхождение #{mismatches}: {record['method']} {record['path']}")
+            print(f"   Запрос: {preview(record['request'])}")
+            print(f"   Было:   {a['status']} {preview(a['response'])}")
+            print(f"   Стало:  {b['status']} {preview(b['response'])}")
+    return mismatches
+
+
+def print_latency(name, results):
+    s = latency_summary(results)
+    print(f"   {name:<10} n={s['count']}  mean={s['mean']:.2f}  p50={s['p50']:.2f}  "
+          f"p90={s['p90']:.2f}  p99={s['p99']:.2f}  max={s['max']:.2f} мс")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение записанного трафика навыка")
+    parser.add_argument("captures", nargs="+", help="файлы захвата (.jsonl или .jsonl.gz)")
+    parser.add_argument("--app", default="app.py:app", help="приложение для прогона (файл.py:переменная)")
+    parser.add_argument("--compare", help="вторая версия приложения для регрессионного сравнения; без неё с записью "
+                             "сравнивается только структура ответов")
+    parser.add_argument("--rate", type=float, default=0.0, help="запросов в секунду (0 — без ограничения)")
+    parser.add_argument("--seed", type=int, default=0, help="seed для random, одинаковый для обеих версий")
+    parser.add_argument("--max-diffs", type=int, default=10, help="сколько расхождений выводить подробно")
+    args = parser.parse_args(argv)
+
+    records = list(read_captures(args.captures))
+    print(f"📼 Загружено записей: {len(records)}")
+
+    baseline_app = load_wsgi_app(args.app, 0)
+    baseline = replay(baseline_app, records, args.rate, args.seed)
+
+    if args.compare:
+        candidate_app = load_wsgi_app(args.compare, 1)
+        candidate = replay(candidate_app, records, args.rate, args.seed)
+        names = ("база", "новая")
+        runs = (baseline, candidate)
+        key = normalize_body
+    else:
+        recorded = [{"status": r["status"], "response": r["response"], "duration_ms": r["duration_ms"]}
+                    for r in records]
+        names = ("запись", "прогон")
+        runs = (recorded, baseline)
+        key = response_shape
+        print("Сравнение с записью: только структура ответов (кнопки, end_session)")
+
+    mismatches = compare(records, runs[0], runs[1], args.max_diffs, key)
+
+    print("\n⏱️ Задержка:")
+    for name, results in zip(names, runs):
+        print_latency(name, results)
+    print(f"\nРасхождений в ответах: {mismatches} из {len(records)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import pytest
+
+import app
+
+QUESTION = {
+    "Вопрос": "Тестовый вопрос?",
+    "Варианты": ["А) Один", "Б) Два", "В) Три", "Г) Четыре"],
+    "Правильный": ["Б)", "Г)"],
+    "Пояснение": "Пояснение",
+    "Изображение": None
+}
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.fixture
+def test_question(monkeypatch):
+    monkeypatch.setitem(app.questions_by_id, "Тест:2", ("Тест", QUESTION))
+    return "Тест:2"
+
+
+def answer_in_voice_flow(client, command):
+    session_id = "grading_test"
+    app.user_sessions[session_id] = {
+        "topic": "1 документ",
+        "question": QUESTION,
+        "previous_questions": [QUESTION["Вопрос"]],
+        "mode": "question"
+    }
+    response = client.post("/", json={
+        "version": "1.0",
+        "session": {"new": False, "session_id": session_id},
+        "request": {"command": command}
+    })
+    return response.get_json()["response"]["text"]
+
+
+@pytest.mark.parametrize("answers, verdict", [
+    (["б", "г"], "correct"),
+    (["б"], "partial"),
+    (["б", "в"], "partial"),
+    (["а"], "incorrect"),
+    ([], "unrecognized"),
+])
+def test_grade_answers_verdicts(answers, verdict):
+    assert app.grade_answers(answers, ["б", "г"])[0] == verdict
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("б г", "Верно!"),
+    ("2", "Частично верно! Вы выбрали правильные ответы, но не хватает: Г)"),
+    ("б в", "Частично верно! Правильные: Б), неправильные: В)"),
+    ("а", "Неверно.\nПравильный ответ: Б), Г)"),
+    ("xyz", "Не понял ответ"),
+])
+def test_voice_flow_grading(client, command, expected):
+    assert answer_in_voice_flow(client, command).startswith(expected)
+
+
+def test_grade_batch_verdicts_and_topics(test_question):
+    result = app.grade_batch([
+        (test_question, "б г"),
+        (test_question, "2 4"),
+        (test_question, "б"),
+        (test_question, "б в"),
+        (test_question, "а"),
+        ("нет:2", "а"),
+    ])
+
+    verdicts = [r["verdict"] for r in result["results"]]
+    assert verdicts == ["correct", "correct", "partial", "partial", "incorrect", "unknown_question"]
+    assert result["results"][2]["missing"] == ["Г)"]
+    assert result["results"][3]["incorrect"] == ["В)"]
+    assert result["unknown_questions"] == 1
+    assert result["topics"]["Тест"] == {
+        "total": 5, "correct": 2, "partial": 2, "incorrect": 1, "unrecognized": 0, "percent": 40.0
+    }
+
+
+def test_grade_batch_endpoint(client, test_question):
+    response = client.post("/grade/batch", json={"answers": [
+        {"question_id": test_question, "answer": "б г"},
+        [test_question, 1],
+    ]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [r["verdict"] for r in data["results"]] == ["correct", "incorrect"]
+
+
+@pytest.mark.parametrize("answer", [["а"], {"a": 1}, True, "а" * (app.MAX_ANSWER_LENGTH + 1)])
+def test_grade_batch_endpoint_rejects_bad_answers(client, test_question, answer):
+    response = client.post("/grade/batch", json={"answers": [{"question_id": test_question, "answer": answer}]})
+    assert response.status_code == 400
+
+
+def test_question_ids_match_excel_rows(client):
+    questions = client.get("/questions").get_json()["questions"]
+    first = questions[0]
+
+    sheet = app.workbook[first["topic"]]
+    row_number = int(first["id"].rsplit(":", 1)[1])
+    assert str(sheet.cell(row=row_number, column=1).value).strip() == first["question"]
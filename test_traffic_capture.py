@@ -0,0 +1,166 @@
+import gzip
+import io
+import json
+import logging
+import time
+
+from werkzeug.test import Client, EnvironBuilder, run_wsgi_app
+
+import app
+import replay
+from traffic_capture import CaptureWriter, TrafficCaptureMiddleware, read_captures
+
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record):
+        self.records.append(record)
+
+
+def alice_request(session_id, command, new=False):
+    return {
+        "version": "1.0",
+        "session": {"new": new, "session_id": session_id},
+        "request": {"command": command}
+    }
+
+
+def run_session(client, session_id):
+    for command, new in [("", True), ("1 документ", False), ("а", False), ("пропустить", False), ("назад", False)]:
+        client.post("/", json=alice_request(session_id, command, new))
+
+
+def capture_client(writer, sample_rate):
+    return Client(TrafficCaptureMiddleware(app.app.wsgi_app, writer, sample_rate=sample_rate))
+
+
+def test_not_sampled_request_passes_through():
+    writer = ListWriter()
+    response = capture_client(writer, 0).post("/", json=alice_request("pass", "", new=True))
+
+    assert response.get_json()["response"]["text"].startswith("Привет")
+    assert writer.records == []
+
+
+def test_sampled_request_reaches_app_with_body():
+    writer = ListWriter()
+    client = capture_client(writer, 1.0)
+    client.post("/", json=alice_request("body", "", new=True))
+    response = client.post("/", json=alice_request("body", "1 документ"))
+
+    assert response.get_json()["response"]["buttons"][0]["title"] == "Пропустить"
+    assert json.loads(writer.records[1]["request"]) == alice_request("body", "1 документ")
+    assert json.loads(writer.records[1]["response"]) == response.get_json()
+
+
+def test_chunked_body_is_read_to_eof():
+    writer = ListWriter()
+    body = json.dumps(alice_request("chunked", "", new=True)).encode("utf-8")
+    environ = EnvironBuilder(path="/", method="POST", input_stream=io.BytesIO(body),
+                             content_type="application/json").get_environ()
+    del environ["CONTENT_LENGTH"]
+    environ["wsgi.input_terminated"] = True
+
+    response = capture_client(writer, 1.0).open(environ)
+
+    assert response.get_json()["response"]["text"].startswith("Привет")
+    assert writer.records[0]["request"] == body.decode("utf-8")
+
+
+def test_body_of_unknown_length_is_not_touched():
+    writer = ListWriter()
+    environ = EnvironBuilder(path="/", method="POST", input_stream=io.BytesIO(b"{}")).get_environ()
+    del environ["CONTENT_LENGTH"]
+    stream = environ["wsgi.input"]
+    seen = {}
+
+    def inner(environ, start_response):
+        seen["input"] = environ["wsgi.input"]
+        start_response("200 OK", [])
+        return [b""]
+
+    run_wsgi_app(TrafficCaptureMiddleware(inner, writer, sample_rate=1.0), environ)
+
+    assert seen["input"] is stream
+    assert writer.records == []
+
+
+def test_sessions_are_sampled_whole():
+    writer = ListWriter()
+    client = capture_client(writer, 0.5)
+    for i in range(40):
+        run_session(client, f"whole_{i}")
+
+    per_session = {}
+    for record in writer.records:
+        session_id = json.loads(record["request"])["session"]["session_id"]
+        per_session[session_id] = per_session.get(session_id, 0) + 1
+
+    assert 0 < len(per_session) < 40
+    assert set(per_session.values()) == {5}
+
+
+def test_capture_round_trip(tmp_path):
+    writer = CaptureWriter(str(tmp_path), flush_interval=0.05)
+    records = [{"request": f"запрос {i}", "response": "ответ"} for i in range(3)]
+    for record in records:
+        writer.submit(record)
+    writer.close()
+
+    assert list(read_captures(sorted(str(p) for p in tmp_path.iterdir()))) == records
+
+
+def test_old_file_is_rotated_by_age(tmp_path):
+    writer = CaptureWriter(str(tmp_path), max_file_age=0.05, flush_interval=0.05)
+    writer.submit({"n": 1})
+    time.sleep(0.3)
+    files_after_rotation = list(tmp_path.iterdir())
+    writer.submit({"n": 2})
+    writer.close()
+
+    assert len(files_after_rotation) == 1
+    assert list(read_captures([str(files_after_rotation[0])])) == [{"n": 1}]
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_truncated_file_keeps_read_records(tmp_path, caplog):
+    path = tmp_path / "capture.jsonl.gz"
+    data = gzip.compress("".join(json.dumps({"n": i}) + "\n" for i in range(3)).encode("utf-8"))
+    path.write_bytes(data[:-8])
+
+    with caplog.at_level(logging.WARNING):
+        records = list(read_captures([str(path)]))
+
+    assert records == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert "оборван" in caplog.text
+
+
+def test_close_does_not_hang_and_reports_dropped(tmp_path, caplog):
+    writer = CaptureWriter(str(tmp_path), queue_size=1)
+    writer.close()
+    writer.submit({"n": 1})
+    writer.submit({"n": 2})
+
+    started = time.monotonic()
+    with caplog.at_level(logging.WARNING):
+        writer.close(timeout=0.1)
+
+    assert time.monotonic() - started < 1
+    assert "отброшено 1" in caplog.text
+
+
+def test_replay_of_captured_sessions_matches():
+    writer = ListWriter()
+    client = capture_client(writer, 1.0)
+    for i in range(3):
+        run_session(client, f"replay_{i}")
+    records = writer.records
+
+    replayed = replay.replay(app.app, records)
+    assert replay.compare(records, records, replayed, key=replay.response_shape) == 0
+
+    baseline = replay.replay(replay.load_wsgi_app("app.py:app", 0), records, seed=1)
+    candidate = replay.replay(replay.load_wsgi_app("app.py:app", 1), records, seed=1)
+    assert replay.compare(records, baseline, candidate) == 0
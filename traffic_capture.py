@@ -0,0 +1,226 @@
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+# ===============================
+# 📼 Запись трафика для повторного воспроизведения
+# ===============================
+class CaptureWriter:
+    """Фоновая запись событий в сжатые JSONL-файлы с ротацией по числу записей и возрасту файла"""
+
+    def __init__(self, directory, max_records_per_file=10000, max_file_age=3600.0, queue_size=10000,
+                 flush_interval=1.0):
+        self.directory = directory
+        self.max_records_per_file = max_records_per_file
+        self.max_file_age = max_file_age
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._dropped_lock = threading.Lock()
+        self._file = None
+        self._file_opened_at = 0.0
+        self._records_in_file = 0
+        self._file_index = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Поставить запись в очередь, не блокируя обработку запроса"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self, timeout=5.0):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Очередь записи трафика переполнена, часть записей не будет сохранена")
+        self._thread.join(timeout)
+        self._log_dropped()
+
+    def _log_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning(f"Запись трафика: отброшено {dropped} записей из-за переполнения очереди")
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._log_dropped()
+
+    def _open_next_file(self):
+        self._close_file()
+        self._file_index += 1
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"capture-{stamp}-{os.getpid()}-{self._file_index}.jsonl.gz")
+        self._file = io.TextIOWrapper(gzip.open(path, "wb"), encoding="utf-8")
+        self._file_opened_at = time.monotonic()
+        self._records_in_file = 0
+        logger.info(f"Запись трафика в {path}")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = False
+
+            if record is None:
+                break
+
+            # Старый файл закрываем даже без новых записей, чтобы он не оставался недописанным
+            if self._file and time.monotonic() - self._file_opened_at >= self.max_file_age:
+                self._close_file()
+
+            if record:
+                if self._file is None or self._records_in_file >= self.max_records_per_file:
+                    self._open_next_file()
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._records_in_file += 1
+                self.written += 1
+
+            if self._file and time.monotonic() - last_flush >= self.flush_interval:
+                self._file.flush()
+                last_flush = time.monotonic()
+
+        self._close_file()
+
+
+def session_sample_point(body):
+    """Точка выборки сессии в [0, 1): одинакова для всех запросов сессии и во всех процессах"""
+    try:
+        session_id = json.loads(body)["session"]["session_id"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not session_id:
+        return None
+    return zlib.crc32(str(session_id).encode("utf-8")) / 2 ** 32
+
+
+class TrafficCaptureMiddleware:
+    """WSGI-middleware: сохраняет часть сессий вебхука вместе с ответами и временем обработки.
+
+    Решение о записи принимается по session_id, поэтому сессия попадает в запись целиком —
+    иначе при воспроизведении ответы приходят в несуществующие сессии.
+    """
+
+    def __init__(self, wsgi_app, writer, sample_rate=0.1, paths=("/",), methods=("POST",)):
+        self.wsgi_app = wsgi_app
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.paths = set(paths)
+        self.methods = set(methods)
+        # Собственный генератор: глобальный random использует выбор вопросов
+        self._random = random.Random()
+
+    def _read_body(self, environ):
+        """Прочитать тело запроса и подменить wsgi.input копией; None — если длина неизвестна"""
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return None
+
+        if length > 0:
+            body = environ["wsgi.input"].read(length)
+        elif environ.get("wsgi.input_terminated"):
+            body = environ["wsgi.input"].read()
+        elif "CONTENT_LENGTH" in environ:
+            body = b""
+        else:
+            return None
+
+        environ["wsgi.input"] = io.BytesIO(body)
+        return body
+
+    def __call__(self, environ, start_response):
+        if (self.sample_rate <= 0
+                or environ.get("REQUEST_METHOD") not in self.methods
+                or environ.get("PATH_INFO") not in self.paths):
+            return self.wsgi_app(environ, start_response)
+
+        body = self._read_body(environ)
+        if body is None:
+            return self.wsgi_app(environ, start_response)
+
+        point = session_sample_point(body)
+        if point is None:
+            point = self._random.random()
+        if point >= self.sample_rate:
+            return self.wsgi_app(environ, start_response)
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured["status"] = status
+            captured["headers"] = headers
+            return start_response(status, headers, exc_info)
+
+        started = time.perf_counter()
+        result = self.wsgi_app(environ, capture_start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        self.writer.submit({
+            "timestamp": datetime.now().isoformat(),
+            "method": environ.get("REQUEST_METHOD"),
+            "path": environ.get("PATH_INFO"),
+            "query": environ.get("QUERY_STRING", ""),
+            "content_type": environ.get("CONTENT_TYPE", ""),
+            "request": body.decode("utf-8", errors="replace"),
+            "status": captured.get("status", ""),
+            "response": b"".join(chunks).decode("utf-8", errors="replace"),
+            "duration_ms": round(duration_ms, 3)
+        })
+        return chunks
+
+
+def read_captures(paths):
+    """Прочитать записи из файлов захвата (.jsonl или .jsonl.gz) по порядку.
+
+    Недописанный файл (процесс был убит) читается до места обрыва.
+    """
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            lines = iter(f)
+            while True:
+                try:
+                    line = next(lines)
+                except StopIteration:
+                    break
+                except (EOFError, OSError, zlib.error) as e:
+                    logger.warning(f"Файл {path} оборван, прочитаны записи до места обрыва: {e}")
+                    break
+
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Файл {path}: пропущена недописанная строка")
+                    continue
+                yield record